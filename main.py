@@ -1,85 +1,201 @@
 import os
+import time
+import hashlib
+import hmac
+import base64
+import re
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List
 
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-from passlib.context import CryptContext
+import orjson
+import bcrypt
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
-from database import db, create_document, get_documents
+from database import db, create_document, find_documents
 from schemas import Applicant, User as UserSchema, LoginRequest, TokenResponse, MeResponse
 
+logger = logging.getLogger(__name__)
+
+
+def _orjson_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError
+
+
+class MongoJSONResponse(ORJSONResponse):
+    """ORJSONResponse that understands raw Mongo documents (naive UTC datetimes, ObjectId)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NAIVE_UTC)
+
+
 # ---------------- App & CORS ----------------
-app = FastAPI(title="PMB UMB Jakarta API", version="1.1.0")
+app = FastAPI(title="PMB UMB Jakarta API", version="1.1.0", default_response_class=MongoJSONResponse)
+
+# Comma-separated list of allowed frontend origins
+FRONTEND_ORIGINS = [o.strip() for o in os.getenv("FRONTEND_ORIGIN", "https://pmb.umb.ac.id").split(",") if o.strip()]
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=FRONTEND_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Authorization", "Content-Type"],
 )
+# Applicant listings compress well; small responses are sent as-is
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
 # ---------------- Security / Auth ----------------
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkeychange")
 ALGORITHM = "HS256"
+_SECRET_KEY_BYTES = SECRET_KEY.encode()
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 12  # 12 hours
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Short-lived cache of validated tokens -> user docs, so polling clients
+# don't pay for a JWT verify + Mongo lookup on every request.
+TOKEN_CACHE_TTL = 5.0  # seconds
+TOKEN_CACHE_MAXSIZE = 10_000
+_token_cache: dict[bytes, tuple[float, dict]] = {}
+_OBJECTID_RE = re.compile(r"[0-9a-fA-F]{24}")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# bcrypt is CPU-bound; run it off the event loop on a pool sized to the
+# machine. The semaphore only limits how many jobs are submitted to the pool
+# at once; excess callers still wait in its (unbounded) queue.
+BCRYPT_WORKERS = os.cpu_count() or 1
+bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_slots = asyncio.Semaphore(BCRYPT_WORKERS)
+
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 
 def verify_password(plain: str, hashed: str) -> bool:
     try:
-        return pwd_context.verify(plain, hashed)
-    except Exception:
+        return bcrypt.checkpw(plain.encode(), hashed.encode())
+    except ValueError:
         return False
 
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+# Verified against when the email is unknown, so a miss costs the same bcrypt work as a hit
+_DUMMY_HASH = hash_password("dummy-password")
 
 
-# Helper to convert Mongo docs
-class PyObjectId(ObjectId):
-    @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
+async def run_bcrypt(func, *args):
+    async with _bcrypt_slots:
+        return await asyncio.get_running_loop().run_in_executor(bcrypt_pool, func, *args)
+
+
+def _b64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+# Tokens are always HS256, so the header segment is a constant
+_ENCODED_HEADER_B64 = _b64url(orjson.dumps({"alg": ALGORITHM, "typ": "JWT"}))
 
-    @classmethod
-    def validate(cls, v):
-        if not ObjectId.is_valid(v):
-            raise ValueError("Invalid objectid")
-        return ObjectId(v)
 
+def _b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
 
+
+def _verify_hs256(token: str) -> dict:
+    """Verify an HS256 JWT and return its claims; raises ValueError if invalid or expired."""
+    header_b64, payload_b64, signature_b64 = token.split(".")
+    expected = hmac.new(_SECRET_KEY_BYTES, f"{header_b64}.{payload_b64}".encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, _b64url_decode(signature_b64)):
+        raise ValueError("Invalid signature")
+    if orjson.loads(_b64url_decode(header_b64)).get("alg") != ALGORITHM:
+        raise ValueError("Unexpected algorithm")
+    payload = orjson.loads(_b64url_decode(payload_b64))
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid claims")
+    exp = payload.get("exp")
+    if not isinstance(exp, (int, float)) or exp <= time.time():
+        raise ValueError("Token expired")
+    return payload
+
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    to_encode = data.copy()
+    lifetime = expires_delta.total_seconds() if expires_delta else ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    to_encode["exp"] = int(time.time() + lifetime)
+    signing_input = _ENCODED_HEADER_B64 + b"." + _b64url(orjson.dumps(to_encode))
+    signature = hmac.new(_SECRET_KEY_BYTES, signing_input, hashlib.sha256).digest()
+    return (signing_input + b"." + _b64url(signature)).decode()
+
+
+# Helper to convert Mongo docs
 def serialize_doc(doc):
-    doc = dict(doc)
+    # Mutates in place: docs come fresh off the cursor and aren't reused
     doc["id"] = str(doc.pop("_id"))
-    for k in ["created_at", "updated_at"]:
-        if k in doc and hasattr(doc[k], "isoformat"):
-            doc[k] = doc[k].isoformat()
     return doc
 
 
+# Fields returned by the applicant listings; keeps stray keys off the wire
+APPLICANT_LIST_PROJECTION = {**{field: 1 for field in Applicant.model_fields}, "created_at": 1}
+APPLICANT_LIST_SORT = [("created_at", -1)]
+
+
+@app.on_event("startup")
+async def warm_up_db():
+    if db is None:
+        return
+    try:
+        # Opens the first connection so the first request doesn't pay for server
+        # selection; minPoolSize fills the rest of the pool in the background
+        await db.command("ping")
+    except Exception:
+        logger.warning("Startup ping to the database failed", exc_info=True)
+
+
+@app.on_event("startup")
+async def ensure_indexes():
+    if db is None:
+        return
+    # Don't block startup on a failed build (unreachable DB, duplicate emails);
+    # each index is attempted independently and failures are logged
+    for collection, keys, options in [
+        ("user", "email", {"unique": True}),
+        ("applicant", [("created_at", -1)], {}),
+    ]:
+        try:
+            await db[collection].create_index(keys, **options)
+        except Exception:
+            logger.exception("Failed to create index %r on %s", keys, collection)
+
+
 # ---------------- Root & Health ----------------
+COLLECTIONS_CACHE_TTL = 30.0  # seconds
+_collections_cache: Optional[tuple[float, List[str]]] = None
+
+
+async def cached_collection_names() -> List[str]:
+    global _collections_cache
+    if _collections_cache is None or time.monotonic() - _collections_cache[0] > COLLECTIONS_CACHE_TTL:
+        _collections_cache = (time.monotonic(), await db.list_collection_names())
+    return _collections_cache[1]
+
+
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "API Pendaftaran Mahasiswa Baru UMB Jakarta"}
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -96,7 +212,8 @@ def test_database():
             response["database_name"] = db.name
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                await db.command("ping")
+                collections = await cached_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -110,58 +227,83 @@ def test_database():
 
 
 # ---------------- Auth Endpoints ----------------
-@app.post("/auth/register", response_model=MeResponse, status_code=201)
-def register(user: UserSchema):
+@app.post("/auth/register", status_code=201, responses={201: {"model": MeResponse}})
+async def register(user: UserSchema):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
 
-    existing = db["user"].find_one({"email": user.email})
+    existing = await db["user"].find_one({"email": user.email}, projection={"_id": 1})
     if existing:
         raise HTTPException(status_code=400, detail="Email sudah terdaftar")
 
-    data = user.model_dump()
-    data["password"] = hash_password(data["password"])
-    data["created_at"] = datetime.now(timezone.utc)
-    data["updated_at"] = datetime.now(timezone.utc)
+    data = {
+        "full_name": user.full_name,
+        "email": user.email,
+        "password": await run_bcrypt(hash_password, user.password),
+        "role": user.role,
+        "is_active": user.is_active,
+    }
+    now = datetime.now(timezone.utc)
+    data["created_at"] = now
+    data["updated_at"] = now
 
-    result = db["user"].insert_one(data)
+    try:
+        result = await db["user"].insert_one(data)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent registration for the same email
+        raise HTTPException(status_code=400, detail="Email sudah terdaftar")
     return MeResponse(id=str(result.inserted_id), full_name=user.full_name, email=user.email, role=user.role)
 
 
-@app.post("/auth/login", response_model=TokenResponse)
-def login(payload: LoginRequest):
+@app.post("/auth/login", responses={200: {"model": TokenResponse}})
+async def login(payload: LoginRequest):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
 
-    user = db["user"].find_one({"email": payload.email})
-    if not user or not verify_password(payload.password, user.get("password", "")):
+    user = await db["user"].find_one({"email": payload.email}, projection={"email": 1, "password": 1, "role": 1})
+    hashed = user.get("password") if user else None
+    password_ok = await run_bcrypt(verify_password, payload.password, hashed or _DUMMY_HASH)
+    if not hashed or not password_ok:
         raise HTTPException(status_code=401, detail="Email atau password salah")
 
     token = create_access_token({"sub": str(user["_id"]), "email": user["email"], "role": user.get("role", "applicant")})
     return TokenResponse(access_token=token)
 
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
     credentials_exception = HTTPException(status_code=401, detail="Tidak terautentikasi")
 
+    cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    cached = _token_cache.get(cache_key)
+    if cached and time.monotonic() < cached[0]:
+        return cached[1]
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = _verify_hs256(token)
         user_id: str = payload.get("sub")
-        if user_id is None:
+        if not isinstance(user_id, str) or not _OBJECTID_RE.fullmatch(user_id):
             raise credentials_exception
-    except JWTError:
+    except ValueError:
         raise credentials_exception
 
-    user = db["user"].find_one({"_id": ObjectId(user_id)})
+    user = await db["user"].find_one({"_id": ObjectId(user_id)}, projection={"password": 0})
     if not user:
         raise credentials_exception
+
+    # Never outlive the token itself; "exp" is wall-clock, the cache is monotonic
+    ttl = min(TOKEN_CACHE_TTL, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        _token_cache.pop(cache_key, None)
+        if len(_token_cache) >= TOKEN_CACHE_MAXSIZE:
+            _token_cache.pop(next(iter(_token_cache)), None)
+        _token_cache[cache_key] = (time.monotonic() + ttl, user)
     return user
 
 
-@app.get("/auth/me", response_model=MeResponse)
-def me(current_user: dict = Depends(get_current_user)):
+@app.get("/auth/me", responses={200: {"model": MeResponse}})
+async def me(current_user: dict = Depends(get_current_user)):
     return MeResponse(id=str(current_user["_id"]), full_name=current_user.get("full_name"), email=current_user.get("email"), role=current_user.get("role", "applicant"))
 
 
@@ -169,7 +311,9 @@ def me(current_user: dict = Depends(get_current_user)):
 @app.post("/api/applicants", status_code=201)
 async def create_applicant(payload: Applicant):
     try:
-        inserted_id = create_document("applicant", payload)
+        # Already validated and flat, so the field dict is safe to store as-is
+        # (create_document copies it); skips a model_dump() walk
+        inserted_id = await create_document("applicant", payload.__dict__)
         return {"id": inserted_id, "message": "Pendaftaran berhasil diterima"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -178,8 +322,9 @@ async def create_applicant(payload: Applicant):
 @app.get("/api/applicants")
 async def list_applicants(limit: Optional[int] = 50):
     try:
-        docs = get_documents("applicant", limit=limit)
-        return [serialize_doc(d) for d in docs]
+        cursor = find_documents("applicant", limit=limit, projection=APPLICANT_LIST_PROJECTION, sort=APPLICANT_LIST_SORT)
+        # Returning the response directly skips FastAPI's jsonable_encoder pass
+        return MongoJSONResponse([serialize_doc(d) async for d in cursor])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -191,8 +336,9 @@ async def admin_list_applicants(limit: Optional[int] = 100, current_user: dict =
     if role != "admin":
         raise HTTPException(status_code=403, detail="Akses ditolak")
     try:
-        docs = get_documents("applicant", limit=limit)
-        return [serialize_doc(d) for d in docs]
+        cursor = find_documents("applicant", limit=limit, projection=APPLICANT_LIST_PROJECTION, sort=APPLICANT_LIST_SORT)
+        # Returning the response directly skips FastAPI's jsonable_encoder pass
+        return MongoJSONResponse([serialize_doc(d) async for d in cursor])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -200,4 +346,4 @@ async def admin_list_applicants(limit: Optional[int] = 100, current_user: dict =
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    uvicorn.run(app, host="0.0.0.0", port=port, loop="auto", http="httptools", access_log=False)
@@ -7,7 +7,7 @@ These schemas are used for data validation in your application.
 Each Pydantic model represents a collection in your database.
 Model name is converted to lowercase for the collection name:
 - User -> "user" collection
-- Product -> "product" collection
+- Applicant -> "applicant" collection
 - BlogPost -> "blogs" collection
 """
 
@@ -59,10 +59,3 @@ class MeResponse(BaseModel):
     full_name: str
     email: EmailStr
     role: Literal['applicant', 'admin']
-
-class Product(BaseModel):
-    title: str
-    description: Optional[str] = None
-    price: float
-    category: str
-    in_stock: bool = True